@@ -14,7 +14,10 @@
 # limitations under the License.
 
 # SO100 Real Robot
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 
 import cv2
@@ -26,7 +29,10 @@ from lerobot.common.robot_devices.cameras.configs import OpenCVCameraConfig
 from lerobot.common.robot_devices.motors.dynamixel import TorqueMode
 from lerobot.common.robot_devices.robots.configs import So100RobotConfig
 from lerobot.common.robot_devices.robots.utils import make_robot_from_config
-from lerobot.common.robot_devices.utils import RobotDeviceAlreadyConnectedError
+from lerobot.common.robot_devices.utils import (
+    RobotDeviceAlreadyConnectedError,
+    busy_wait,
+)
 
 # NOTE:
 # Sometimes we would like to abstract different env, or run this on a separate machine
@@ -66,6 +72,23 @@ class SO100Robot:
         # Create the robot
         self.robot = make_robot_from_config(self.config)
         self.motor_bus = self.robot.follower_arms["main"]
+        # serializes motor bus I/O: the port handler is not thread-safe and
+        # the inference worker reads state while the control thread writes
+        # goal positions
+        self._bus_lock = threading.Lock()
+        # reused state buffer for get_current_state: the torch tensor and its
+        # numpy view share storage, so the state crosses the numpy/torch
+        # boundary without a copy in either direction
+        self._state_buf = torch.empty(len(self.motor_bus.motor_names), dtype=torch.float32)
+        self._state_buf_np = self._state_buf.numpy()
+        # persistent action tensor filled in place by set_target_state_np; the
+        # bus is serial so there is no host->device copy to pin memory for
+        self._action_buf = torch.empty(len(self.motor_bus.motor_names), dtype=torch.float32)
+
+        # reused output buffers for the bgr -> rgb swap in get_current_img,
+        # one per calling thread so the control thread and the inference
+        # worker never overwrite each other's frame
+        self._rgb_bufs = threading.local()
 
     @contextmanager
     def activate(self):
@@ -105,21 +128,27 @@ class SO100Robot:
         print("================> SO100 Robot is fully connected =================")
 
     def set_so100_robot_preset(self):
-        # Mode=0 for Position Control
-        self.motor_bus.write("Mode", 0)
-        # Set P_Coefficient to lower value to avoid shakiness (Default is 32)
-        # self.motor_bus.write("P_Coefficient", 16)
-        self.motor_bus.write("P_Coefficient", 10)
-        # Set I_Coefficient and D_Coefficient to default value 0 and 32
-        self.motor_bus.write("I_Coefficient", 0)
-        self.motor_bus.write("D_Coefficient", 32)
-        # Close the write lock so that Maximum_Acceleration gets written to EPROM address,
-        # which is mandatory for Maximum_Acceleration to take effect after rebooting.
-        self.motor_bus.write("Lock", 0)
-        # Set Maximum_Acceleration to 254 to speedup acceleration and deceleration of
-        # the motors. Note: this configuration is not in the official STS3215 Memory Table
-        self.motor_bus.write("Maximum_Acceleration", 254)
-        self.motor_bus.write("Acceleration", 254)
+        # Every write below already goes out as one grouped sync-write packet
+        # covering all motors on the bus, so one round trip per register is the
+        # floor the Feetech protocol allows (no cross-register bulk write).
+        preset = [
+            # Mode=0 for Position Control
+            ("Mode", 0),
+            # Set P_Coefficient to lower value to avoid shakiness (Default is 32)
+            ("P_Coefficient", 10),
+            # Set I_Coefficient and D_Coefficient to default value 0 and 32
+            ("I_Coefficient", 0),
+            ("D_Coefficient", 32),
+            # Close the write lock so that Maximum_Acceleration gets written to EPROM address,
+            # which is mandatory for Maximum_Acceleration to take effect after rebooting.
+            ("Lock", 0),
+            # Set Maximum_Acceleration to 254 to speedup acceleration and deceleration of
+            # the motors. Note: this configuration is not in the official STS3215 Memory Table
+            ("Maximum_Acceleration", 254),
+            ("Acceleration", 254),
+        ]
+        for register, value in preset:
+            self.motor_bus.write(register, value)
 
     def move_to_initial_pose(self):
         current_state = self.robot.capture_observation()["observation.state"]
@@ -142,26 +171,60 @@ class SO100Robot:
         return self.robot.capture_observation()
 
     def get_current_state(self):
-        return self.get_observation()["observation.state"].data.numpy()
-
-    def get_current_img(self):
-        img = self.get_observation()["observation.images.webcam"].data.numpy()
-        # convert bgr to rgb
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        return img
+        # Read all joints in a single grouped sync-read (one instruction/status
+        # packet on the bus) instead of going through capture_observation(),
+        # which would also block on a camera frame. Returned as a torch tensor;
+        # callers needing numpy take a zero-copy .numpy() view.
+        with self._bus_lock:
+            position = self.motor_bus.read("Present_Position")
+        np.copyto(self._state_buf_np, position)
+        return self._state_buf
+
+    def get_current_img(self, require_new: bool = False):
+        # fast path: async_read keeps lerobot's own background reader thread
+        # draining the camera and returns the latest frame slot without
+        # blocking on a capture; capture_observation() uses the same reader,
+        # so there is exactly one thread touching the cv2 handle
+        if require_new:
+            # wait for the reader to land a frame newer than the current slot
+            prev_ts = self.camera.logs.get("timestamp_utc")
+            img = self.camera.async_read()
+            while self.camera.logs.get("timestamp_utc") == prev_ts:
+                time.sleep(0.001)
+                img = self.camera.async_read()
+        else:
+            img = self.camera.async_read()
+        # bgr -> rgb via a reversed channel view copied into the calling
+        # thread's reused buffer: one pass over the frame, no steady-state
+        # allocation or cvtColor
+        if not hasattr(self._rgb_bufs, "buf"):
+            self._rgb_bufs.buf = np.empty((480, 640, 3), dtype=np.uint8)
+        np.copyto(self._rgb_bufs.buf, img[..., ::-1])
+        return self._rgb_bufs.buf
 
     def set_target_state(self, target_state: torch.Tensor):
-        self.robot.send_action(target_state)
+        with self._bus_lock:
+            self.robot.send_action(target_state)
+
+    def set_target_state_np(self, target_state: np.ndarray):
+        # fill the persistent tensor in place instead of wrapping a new
+        # torch.Tensor around every action, zero allocation per tick
+        self._action_buf.numpy()[:] = target_state
+        with self._bus_lock:
+            self.robot.send_action(self._action_buf)
 
     def enable(self):
-        self.motor_bus.write("Torque_Enable", TorqueMode.ENABLED.value)
+        with self._bus_lock:
+            self.motor_bus.write("Torque_Enable", TorqueMode.ENABLED.value)
 
     def disable(self):
-        self.motor_bus.write("Torque_Enable", TorqueMode.DISABLED.value)
+        with self._bus_lock:
+            self.motor_bus.write("Torque_Enable", TorqueMode.DISABLED.value)
 
     def disconnect(self):
         self.disable()
-        self.robot.disconnect()
+        with self._bus_lock:
+            self.robot.disconnect()
         self.robot.is_connected = False
         print("================> SO100 Robot disconnected")
 
@@ -171,6 +234,27 @@ class SO100Robot:
 
 #################################################################################
 
+try:
+    import numba
+
+    _HAS_NUMBA = True
+except ImportError:
+    _HAS_NUMBA = False
+
+
+def _fill_state_bufs(state, buf_single_arm, buf_gripper):
+    # scatter the flat 6-dof state into the preallocated obs buffers; the
+    # float32 -> float64 cast happens element-wise during assignment
+    for i in range(5):
+        buf_single_arm[0, i] = state[i]
+    buf_gripper[0, 0] = state[5]
+
+
+if _HAS_NUMBA:
+    # on a 6-element state the cost is interpreter dispatch, not math, so a
+    # compiled straight-line version removes it; plain python fallback is fine
+    _fill_state_bufs = numba.njit(cache=True)(_fill_state_bufs)
+
 
 class Gr00tRobotInferenceClient:
     def __init__(
@@ -178,19 +262,90 @@ class Gr00tRobotInferenceClient:
         host="localhost",
         port=5555,
         language_instruction="Pick up the fruits and place them on the plate.",
+        jpeg_quality=None,
     ):
         self.language_instruction = language_instruction
         # 480, 640
         self.img_size = (480, 640)
         self.policy = ExternalRobotInferenceClient(host=host, port=port)
-
-    def get_action(self, img, state):
-        obs_dict = {
-            "video.webcam": img[np.newaxis, :, :, :],
-            "state.single_arm": state[:5][np.newaxis, :].astype(np.float64),
-            "state.gripper": state[5:6][np.newaxis, :].astype(np.float64),
+        # Optionally JPEG-compress camera frames before they go on the wire
+        # (~900 KB raw -> ~30-50 KB per frame at quality 85). Off by default
+        # since the server must decode "video.*" bytes for this to work.
+        self.jpeg_quality = jpeg_quality
+        self._jpeg = None
+        if jpeg_quality is not None:
+            try:
+                from turbojpeg import TJPF_RGB, TurboJPEG
+
+                self._jpeg = TurboJPEG()
+                self._jpeg_pixel_format = TJPF_RGB
+            except ImportError:
+                # fall back to cv2.imencode when PyTurboJPEG is not installed
+                pass
+        # preallocated observation buffers: get_action copies into these
+        # instead of allocating fresh state slices (plus a float64 cast)
+        # on every call
+        self._buf_single_arm = np.empty((1, 5), dtype=np.float64)
+        self._buf_gripper = np.empty((1, 1), dtype=np.float64)
+        # persistent contiguous image batch: serializing the same hot buffer
+        # every call beats re-wrapping the frame in a fresh np.newaxis view
+        self._batch_webcam = np.empty((1, self.img_size[0], self.img_size[1], 3), dtype=np.uint8)
+        self._obs_template = {
+            "video.webcam": None,
+            "state.single_arm": self._buf_single_arm,
+            "state.gripper": self._buf_gripper,
             "annotation.human.task_description": [self.language_instruction],
         }
+        # Hint the server to torch.compile / CUDA-graph the policy: the
+        # observation shapes above are fixed for this embodiment, so graph
+        # capture is safe. Servers without the endpoint reply with an error,
+        # which we tolerate.
+        try:
+            self.policy.call_endpoint(
+                "set_inference_mode",
+                {
+                    "compile": True,
+                    "cuda_graph": True,
+                    "pinned_shapes": {
+                        "video.webcam": (1, self.img_size[0], self.img_size[1], 3),
+                        "state.single_arm": (1, 5),
+                        "state.gripper": (1, 1),
+                    },
+                },
+            )
+        except RuntimeError:
+            pass
+        # warm up once so any server-side compilation / graph capture happens
+        # before the control loop starts
+        self.sample_action()
+
+    def _encode_jpeg(self, img):
+        # img is RGB (get_current_img already swapped channels); both encoders
+        # default to BGR input, so tell them explicitly
+        if self._jpeg is not None:
+            return self._jpeg.encode(
+                img, quality=self.jpeg_quality, pixel_format=self._jpeg_pixel_format
+            )
+        ok, encoded = cv2.imencode(
+            ".jpg",
+            cv2.cvtColor(img, cv2.COLOR_RGB2BGR),
+            [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality],
+        )
+        assert ok, "JPEG encoding failed"
+        return encoded.tobytes()
+
+    def get_action(self, img, state):
+        if isinstance(state, torch.Tensor):
+            # zero-copy view at the serialization boundary
+            state = state.numpy()
+        obs_dict = self._obs_template
+        if self.jpeg_quality is not None:
+            obs_dict["video.webcam"] = self._encode_jpeg(img)
+        else:
+            np.copyto(self._batch_webcam, img[None])
+            obs_dict["video.webcam"] = self._batch_webcam
+        _fill_state_bufs(state, self._buf_single_arm, self._buf_gripper)
+        obs_dict["annotation.human.task_description"] = [self.language_instruction]
         res = self.policy.get_action(obs_dict)
         # print("Inference query time taken", time.time() - start_time)
         return res
@@ -211,17 +366,35 @@ class Gr00tRobotInferenceClient:
 #################################################################################
 
 
+# persistent figure and AxesImage artists reused across view_img calls
+_viewer_artists = {"fig": None, "im": None, "im2": None}
+
+
 def view_img(img, img2=None):
     """
     This is a matplotlib viewer since cv2.imshow can be flaky in lerobot env
     also able to overlay the image to ensure camera view is alligned to training settings
+
+    The image artists are created once and updated in place with set_data,
+    so each call only pushes new pixels instead of rebuilding the whole
+    figure (imshow + clf costs tens of ms per frame).
     """
-    plt.imshow(img)
+    if _viewer_artists["im"] is None:
+        plt.ion()
+        _viewer_artists["fig"] = plt.gcf()
+        _viewer_artists["im"] = plt.imshow(img)
+        plt.axis("off")
+    else:
+        _viewer_artists["im"].set_data(img)
     if img2 is not None:
-        plt.imshow(img2, alpha=0.5)
-    plt.axis("off")
-    plt.pause(0.001)  # Non-blocking show
-    plt.clf()  # Clear the figure for the next frame
+        if _viewer_artists["im2"] is None:
+            _viewer_artists["im2"] = plt.imshow(img2, alpha=0.5)
+        else:
+            _viewer_artists["im2"].set_data(img2)
+    # draw_idle + flush_events redraws without the blocking sleep and full
+    # GUI event-loop spin that plt.pause does every call
+    _viewer_artists["fig"].canvas.draw_idle()
+    _viewer_artists["fig"].canvas.flush_events()
 
 
 #################################################################################
@@ -246,6 +419,13 @@ if __name__ == "__main__":
         "--lang_instruction", type=str, default="Pick up the fruits and place them on the plate."
     )
     parser.add_argument("--record_imgs", action="store_true")
+    parser.add_argument(
+        "--jpeg_quality",
+        type=int,
+        default=None,
+        help="JPEG-compress camera frames sent to the policy server (e.g. 85); "
+        "requires a server that decodes video.* bytes",
+    )
     args = parser.parse_args()
 
     # print lang_instruction
@@ -257,11 +437,15 @@ if __name__ == "__main__":
         args.action_horizon
     )  # we will execute only some actions from the action_chunk of 16
     MODALITY_KEYS = ["single_arm", "gripper"]
+    # column offsets of each modality in the flat 6-dof action vector
+    MODALITY_OFFSETS = {"single_arm": (0, 5), "gripper": (5, 6)}
+    CONTROL_PERIOD = 0.02  # 50 Hz control tick
     if USE_POLICY:
         client = Gr00tRobotInferenceClient(
             host=args.host,
             port=args.port,
             language_instruction=args.lang_instruction,
+            jpeg_quality=args.jpeg_quality,
         )
 
         if args.record_imgs:
@@ -272,21 +456,98 @@ if __name__ == "__main__":
 
         robot = SO100Robot(calibrate=False, enable_camera=True, cam_idx=args.cam_idx)
         image_count = 0
-        with robot.activate():
-            for i in tqdm(range(ACTIONS_TO_EXECUTE), desc="Executing actions"):
-                img = robot.get_current_img()
-                view_img(img)
-                state = robot.get_current_state()
-                action = client.get_action(img, state)
-                start_time = time.time()
-                for i in range(ACTION_HORIZON):
-                    concat_action = np.concatenate(
-                        [np.atleast_1d(action[f"action.{key}"][i]) for key in MODALITY_KEYS],
-                        axis=0,
+
+        # RTC-style prefix lock: actions already popped from the queue are
+        # committed and never revisited; while they execute, the next chunk is
+        # requested through a single-worker executor and, when it arrives, it
+        # is blended into the uncommitted suffix instead of replacing it.
+        action_queue = deque()
+        queue_lock = threading.Lock()
+        # state used for the previous inference query, for the near-duplicate filter
+        last_query_state = None
+        # skip a new query if the arm barely moved and actions are still queued
+        QUERY_STATE_EPS = 1e-2
+        # weight kept on the already-queued suffix when blending in a new chunk
+        STITCH_ALPHA = 0.5
+
+        def request_chunk():
+            """Runs on the executor: observe, query the policy and assemble the
+            (horizon, 6) chunk. Returns None when the observation is a
+            near-duplicate of the previous query and actions are still queued."""
+            global last_query_state
+            img = robot.get_current_img()
+            state = robot.get_current_state()
+            state_np = state.numpy()  # zero-copy view of the state tensor
+            with queue_lock:
+                queue_len = len(action_queue)
+            if (
+                last_query_state is not None
+                and queue_len > 0
+                and np.linalg.norm(state_np - last_query_state) < QUERY_STATE_EPS
+            ):
+                return None
+            action = client.get_action(img, state)
+            # get_current_state returns a reused buffer, so keep a copy
+            last_query_state = np.array(state_np)
+            # assemble the whole chunk with one slice assignment per modality
+            # instead of per-step concatenates; rows are handed to the queue
+            # as views into this freshly allocated array
+            new_chunk = np.empty((ACTION_HORIZON, 6), dtype=np.float32)
+            for key in MODALITY_KEYS:
+                lo, hi = MODALITY_OFFSETS[key]
+                new_chunk[:, lo:hi] = np.asarray(
+                    action[f"action.{key}"][:ACTION_HORIZON], dtype=np.float32
+                ).reshape(ACTION_HORIZON, hi - lo)
+            return new_chunk
+
+        def stitch_chunk(new_chunk):
+            """Suffix update: new_chunk[0] aligns with the oldest uncommitted
+            action, so blend the overlap with a weighted average and append the
+            remainder."""
+            with queue_lock:
+                overlap = min(len(action_queue), len(new_chunk))
+                for i in range(overlap):
+                    idx = len(action_queue) - overlap + i
+                    action_queue[idx] = (
+                        STITCH_ALPHA * action_queue[idx] + (1.0 - STITCH_ALPHA) * new_chunk[i]
                     )
+                for target in new_chunk[overlap:]:
+                    action_queue.append(target)
+
+        with robot.activate():
+            executor = ThreadPoolExecutor(max_workers=1)
+            # kick off the first request; later ones fire at half-chunk depth
+            pending = executor.submit(request_chunk)
+            tick_times = []
+            # same total motion as the old blocking loop: one chunk per outer
+            # step, counting only ticks that actually executed an action so
+            # inference stalls don't eat into the budget
+            total_actions = ACTIONS_TO_EXECUTE * ACTION_HORIZON
+            executed = 0
+            pbar = tqdm(total=total_actions, desc="Executing actions")
+            try:
+                while executed < total_actions:
+                    t_tick = time.perf_counter()
+                    # fold a completed inference into the uncommitted suffix
+                    if pending is not None and pending.done():
+                        new_chunk = pending.result()
+                        pending = None
+                        if new_chunk is not None:
+                            stitch_chunk(new_chunk)
+                    with queue_lock:
+                        queue_len = len(action_queue)
+                        concat_action = action_queue.popleft() if action_queue else None
+                    # fire the next request once half the chunk is committed
+                    if pending is None and queue_len - 1 <= ACTION_HORIZON // 2:
+                        pending = executor.submit(request_chunk)
+                    if concat_action is None:
+                        # queue is empty (e.g. first chunk still in flight), wait for it
+                        time.sleep(0.001)
+                        continue
                     assert concat_action.shape == (6,), concat_action.shape
-                    robot.set_target_state(torch.from_numpy(concat_action))
-                    time.sleep(0.02)
+                    robot.set_target_state_np(concat_action)
+                    executed += 1
+                    pbar.update(1)
 
                     # get the realtime image
                     img = robot.get_current_img()
@@ -298,9 +559,28 @@ if __name__ == "__main__":
                         cv2.imwrite(f"eval_images/img_{image_count}.jpg", img)
                         image_count += 1
 
-                    # 0.05*16 = 0.8 seconds
-                    print("executing action", i, "time taken", time.time() - start_time)
-                print("Action chunk execution time taken", time.time() - start_time)
+                    # measure the tick's work time before the rate-limiting
+                    # wait, otherwise every sample would just read ~CONTROL_PERIOD
+                    tick_times.append(time.perf_counter() - t_tick)
+
+                    # fixed-rate tick: the work above eats into the period and
+                    # busy_wait absorbs the remainder, so the loop holds 50 Hz
+                    # without the 1-2 ms jitter of time.sleep
+                    busy_wait(max(0.0, t_tick + CONTROL_PERIOD - time.perf_counter()))
+
+                    # batch per-tick timing into one report per chunk instead of
+                    # printing (and flushing stdout) inside the control loop
+                    if len(tick_times) == ACTION_HORIZON:
+                        print(
+                            f"executed {ACTION_HORIZON} actions, "
+                            f"mean tick work time {np.mean(tick_times):.4f}s"
+                        )
+                        tick_times.clear()
+            finally:
+                pbar.close()
+                # drain any in-flight request before activate()'s finally
+                # disconnects the arm, so no bus read races the torque-disable
+                executor.shutdown(wait=True, cancel_futures=True)
     else:
         # Test Dataset Source https://huggingface.co/datasets/youliangtan/so100_strawberry_grape
         dataset = LeRobotDataset(
@@ -325,7 +605,9 @@ if __name__ == "__main__":
                 robot.set_target_state(action)
                 time.sleep(0.05)
 
-            # plot the actions
+            # plot the actions on a fresh figure; view_img keeps its own
+            # figure and image artists alive for reuse
+            plt.figure()
             plt.plot(actions)
             plt.show()
 